@@ -2,17 +2,25 @@
 """
 Data handling for imars3d.
 """
+import io
+import os
 import re
+import queue
+import weakref
+import threading
 import param
 import multiprocessing
 import numpy as np
 import dxchange
 import tifffile
 from functools import partial
+from operator import methodcaller
 from pathlib import Path
-from fnmatch import fnmatchcase
+from fnmatch import translate
 from typing import Optional, Tuple, List, Callable
-from tqdm.contrib.concurrent import process_map
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+from tqdm import tqdm
 
 
 # setup module level logger
@@ -26,6 +34,16 @@ metadata_dict = {
     65066: 'MotSlitVT.RBV:10.000000',  # APERTURE_VT, [ct, ob]
     65068: 'MotSlitHR.RBV:10.000000',  # APERTURE_VB, [ct, ob]
 }
+# selectors that keep every file, no need to match them one by one
+_ACCEPT_ALL = {None, "", "*"}
+# fnmatch wild card characters
+_GLOB_SPECIAL = re.compile(r"[*?\[]")
+# seconds between checks for a stopped pipeline while waiting on its queue
+_QUEUE_POLL = 0.1
+# shared memory backed image stack of a worker process, see _init_shared_stack
+_shared_shm = None
+_shared_stack = None
+_shared_casting = "safe"
 
 
 class load_data(param.ParameterizedFunction):
@@ -54,6 +72,12 @@ class load_data(param.ParameterizedFunction):
         Unix shells-style wild card ("*.tiff") for selecting dark current
     max_workers: Optional[int]
         maximum number of processes allowed during loading, default to use as many as possible.
+    dtype: Optional[numpy.dtype]
+        data type of the loaded stacks, default (None) keeps the data type from the files, i.e. the
+        native uint16 of the detectors. Data that cannot be cast without changing its kind, e.g.
+        float to uint16, keeps the data type from the files.
+    use_processes: Optional[bool]
+        load with worker processes instead of threads, only useful for readers holding the GIL.
 
     Returns
     -------
@@ -92,67 +116,116 @@ class load_data(param.ParameterizedFunction):
     dc_fnmatch = param.String(default="*", doc="fnmatch for selecting dc files from dc_dir")
     # NOTE: 0 means use as many as possible
     max_workers = param.Integer(default=0, bounds=(0, None), doc="Maximum number of processes allowed during loading")
+    # NOTE: None keeps the data type from the files
+    dtype = param.Parameter(default=None, allow_None=True, doc="Data type of the loaded stacks")
+    use_processes = param.Boolean(default=False, doc="Load with worker processes instead of threads")
 
     def __call__(self, **params):
         """
         This makes the class behaves like a function.
         """
-        # type*bounds check via Parameter
-        _ = self.instance(**params)
+        # type*bounds check via Parameter, only for the given arguments
+        for name, value in params.items():
+            parameter = _LOAD_DATA_PARAMS.get(name)
+            if parameter is None:
+                logger.error(f"Unknown argument {name}.")
+                raise ValueError(f"Unknown argument {name}.")
+            parameter._validate(value)
         # sanitize arguments
         params = param.ParamOverrides(self, params)
         # type validation is done, now replacing max_worker with an actual integer
-        self.max_workers = multiprocessing.cpu_count() - 2 if params.max_workers == 0 else params.max_workers
+        self.max_workers = _default_workers() if params.max_workers == 0 else params.max_workers
         logger.debug(f"max_worker={self.max_workers}")
 
         # multiple dispatch
         # NOTE:
         #    use set to simplify call signature checking
-        sigs = set([k.split("_")[-1] for k in params.keys() if "fnmatch" not in k])
-        if sigs == {"files", "dir"}:
-            logger.error("Files and dir cannot be used at the same time")
-            raise ValueError("Mix usage of allowed signature.")
-        elif sigs == {"files"}:
-            logger.debug("Load by file list")
-            ct, ob, dc = _load_by_file_list(
-                    ct_files=params.get("ct_files"),
-                    ob_files=params.get("ob_files"),
-                    dc_files=params.get("dc_files", []),  # it is okay to skip dc
-                    ct_fnmatch=params.get("ct_fnmatch", "*"),  # incase None got leaked here
-                    ob_fnmatch=params.get("ob_fnmatch", "*"),
-                    dc_fnmatch=params.get("dc_fnmatch", "*"),
-                )
-            ct_files=params.get("ct_files")
-        elif sigs == {"dir"}:
-            logger.debug("Load by directory")
-            ct_files, ob_files, dc_files = _get_filelist_by_dir(
-                    ct_dir=params.get("ct_dir"),
-                    ob_dir=params.get("ob_dir"),
-                    dc_dir=params.get("dc_dir", []),  # it is okay to skip dc
-                    ct_fnmatch=params.get("ct_fnmatch", "*"),  # incase None got leaked here
-                    ob_fnmatch=params.get("ob_fnmatch", "*"),
-                    dc_fnmatch=params.get("dc_fnmatch", "*"),
-                )
-            ct, ob, dc = _load_by_file_list(
-                    ct_files=ct_files,
-                    ob_files=ob_files,
-                    dc_files=dc_files,
-                    ct_fnmatch=params.get("ct_fnmatch", "*"),  # incase None got leaked here
-                    ob_fnmatch=params.get("ob_fnmatch", "*"),
-                    dc_fnmatch=params.get("dc_fnmatch", "*"),
-                )
-        else:
-            logger.warning("Found unknown input arguments, ignoring.")
+        #    the images are loaded in the background so that extracting the rotation
+        #    angles below overlaps with the disk I/O
+        #    only the file list and directory arguments define the signature
+        sigs = set([k.split("_")[-1] for k in params.keys() if k.endswith(("_files", "_dir"))])
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            if sigs == {"files", "dir"}:
+                logger.error("Files and dir cannot be used at the same time")
+                raise ValueError("Mix usage of allowed signature.")
+            elif sigs == {"files"}:
+                logger.debug("Load by file list")
+                loading = executor.submit(
+                        _load_by_file_list,
+                        ct_files=params.get("ct_files"),
+                        ob_files=params.get("ob_files"),
+                        dc_files=params.get("dc_files", []),  # it is okay to skip dc
+                        ct_fnmatch=params.get("ct_fnmatch"),  # None selects everything
+                        ob_fnmatch=params.get("ob_fnmatch"),
+                        dc_fnmatch=params.get("dc_fnmatch"),
+                        max_workers=self.max_workers,
+                        dtype=params.get("dtype"),
+                        use_processes=params.get("use_processes"),
+                    )
+                ct_files=params.get("ct_files")
+            elif sigs == {"dir"}:
+                logger.debug("Load by directory")
+                ct_files, ob_files, dc_files = _get_filelist_by_dir(
+                        ct_dir=params.get("ct_dir"),
+                        ob_dir=params.get("ob_dir"),
+                        dc_dir=params.get("dc_dir", []),  # it is okay to skip dc
+                        ct_fnmatch=params.get("ct_fnmatch", "*"),  # incase None got leaked here
+                        ob_fnmatch=params.get("ob_fnmatch", "*"),
+                        dc_fnmatch=params.get("dc_fnmatch", "*"),
+                    )
+                loading = executor.submit(
+                        _load_by_file_list,
+                        ct_files=ct_files,
+                        ob_files=ob_files,
+                        dc_files=dc_files,
+                        # NOTE: the directory scan has already applied the fnmatch selectors
+                        ct_fnmatch=None,
+                        ob_fnmatch=None,
+                        dc_fnmatch=None,
+                        max_workers=self.max_workers,
+                        dtype=params.get("dtype"),
+                        use_processes=params.get("use_processes"),
+                    )
+            else:
+                logger.warning("Found unknown input arguments, ignoring.")
 
-        # extracting omegas from
-        # 1. filename
-        # 2. metadata (only possible for Tiff)
-        rot_angles = _extract_rotation_angles(ct_files)
+            # extracting omegas from
+            # 1. filename
+            # 2. metadata (only possible for Tiff)
+            rot_angles = _extract_rotation_angles(ct_files)
+            # wait for the images
+            ct, ob, dc = loading.result()
 
         # return everything
         return ct, ob, dc, rot_angles
 
 
+# parameters of load_data, looked up once instead of on every call
+_LOAD_DATA_PARAMS = dict(load_data.param.objects(instance=False))
+
+
+# use _func to avoid sphinx pulling it into docs
+def _default_workers() -> int:
+    """
+    Number of workers to use when max_workers is 0, keeping two CPUs free.
+
+    Returns
+    -------
+        number of workers, at least 1
+
+    Notes
+    -----
+        The CPUs are counted from the affinity mask of the current process so
+        that cpuset limits from containers and batch schedulers are respected.
+    """
+    try:
+        ncpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        # sched_getaffinity is not available on macOS and Windows
+        ncpus = multiprocessing.cpu_count()
+    return max(1, ncpus - 2)
+
+
 # use _func to avoid sphinx pulling it into docs
 def _forgiving_reader(
     filename: str,
@@ -172,18 +245,321 @@ def _forgiving_reader(
     -------
         image as numpy array
     """
+    # NOTE: only errors from reading a corrupted file are forgiven, fatal conditions
+    #       such as KeyboardInterrupt and MemoryError should stop the loading.
     try:
         return reader(filename)
-    except:
-        logger.error(f"Cannot read {filename}, skipping.")
+    except (OSError, ValueError, RuntimeError) as e:
+        logger.error(f"Cannot read {filename}, skipping: {e}")
+        logger.debug(f"Traceback for reading {filename}", exc_info=True)
         return None
 
 
+# use _func to avoid sphinx pulling it into docs
+def _read_tiff(filename: str) -> np.ndarray:
+    """
+    Read tiff image, memory mapping it when the data is stored uncompressed.
+
+    Parameters
+    ----------
+    filename:
+        input filename
+
+    Returns
+    -------
+        image as numpy array, or numpy.memmap for uncompressed tiff
+    """
+    with tifffile.TiffFile(filename) as tif:
+        memmappable = tif.pages[0].compression == 1 and tif.series[0].dataoffset is not None
+    if memmappable:
+        return tifffile.memmap(filename, mode="r")
+    return dxchange.read_tiff(filename)
+
+
+# use _func to avoid sphinx pulling it into docs
+def _memmap_tiff(filename: str) -> np.ndarray:
+    """
+    Memory map tiff image without inspecting its header first, falling back to
+    dxchange when the data turns out to be compressed.
+
+    Parameters
+    ----------
+    filename:
+        input filename
+
+    Returns
+    -------
+        image as numpy.memmap, or numpy array for compressed tiff
+    """
+    try:
+        return tifffile.memmap(filename, mode="r")
+    except ValueError:
+        return dxchange.read_tiff(filename)
+
+
+# reader for each supported file extension (lower case)
+_READERS = {
+    ".tif": _read_tiff,
+    ".tiff": _read_tiff,
+    ".fits": dxchange.read_fits,
+}
+
+
+# use _func to avoid sphinx pulling it into docs
+def _is_tiff_stack(filename: str) -> bool:
+    """
+    Check if given tiff file is a multi-page image stack.
+
+    Parameters
+    ----------
+    filename:
+        input filename
+
+    Returns
+    -------
+        True if the file holds more than one frame
+    """
+    try:
+        with tifffile.TiffFile(filename) as tif:
+            return tif.series[0].ndim > tif.pages[0].ndim
+    except (OSError, ValueError):
+        # leave the error reporting to the forgiving reader
+        return False
+
+
+# use _func to avoid sphinx pulling it into docs
+def _can_cast_frame(
+    src: np.dtype,
+    dst: np.dtype,
+    casting: str,
+) -> bool:
+    """
+    Check if frames of given data type can be stored in a stack of another data type.
+
+    Parameters
+    ----------
+    src:
+        data type of the frame
+    dst:
+        data type of the stack
+    casting:
+        numpy casting rule, "safe" when the stack keeps the data type from the
+        files, "same_kind" when the caller asked for a data type.
+
+    Returns
+    -------
+        True if the frame can be copied into the stack
+    """
+    return np.can_cast(src, dst, casting)
+
+
+# use _func to avoid sphinx pulling it into docs
+def _stack_dtype(
+    src: np.dtype,
+    dtype: Optional[np.dtype],
+    desc: str,
+) -> np.dtype:
+    """
+    Select the data type of the image stack.
+
+    Parameters
+    ----------
+    src:
+        data type from the reader
+    dtype:
+        requested data type, None keeps the data type from the reader
+    desc:
+        description of the stack for logging
+
+    Returns
+    -------
+        requested data type if the frames can be cast to it without changing
+        the kind of data, e.g. float64 to float32, otherwise the data type from
+        the reader.
+    """
+    if dtype is None:
+        return np.dtype(src)
+    if not _can_cast_frame(src, dtype, "same_kind"):
+        logger.warning(f"Cannot cast {desc} from {np.dtype(src)} to {np.dtype(dtype)} safely, keeping {np.dtype(src)}.")
+        return np.dtype(src)
+    return np.dtype(dtype)
+
+
+# use _func to avoid sphinx pulling it into docs
+def _init_shared_stack(
+    name: str,
+    shape: Tuple[int],
+    dtype: np.dtype,
+    casting: str,
+) -> None:
+    """
+    Attach the worker process to the shared memory backed image stack.
+
+    Parameters
+    ----------
+    name:
+        name of the shared memory block
+    shape:
+        shape of the image stack
+    dtype:
+        data type of the image stack
+    casting:
+        numpy casting rule for copying frames into the stack
+    """
+    global _shared_shm, _shared_stack, _shared_casting
+    _shared_casting = casting
+    _shared_shm = shared_memory.SharedMemory(name=name)
+    _shared_stack = np.ndarray(shape, dtype=dtype, buffer=_shared_shm.buf)
+
+
+# use _func to avoid sphinx pulling it into docs
+def _read_into_shared(
+    idx: int,
+    filename: str,
+    reader: Callable,
+) -> bool:
+    """
+    Read image into the shared image stack of the worker process.
+
+    Parameters
+    ----------
+    idx:
+        index of the frame in the stack
+    filename:
+        input filename
+    reader:
+        callable reader function that consumes the filename
+
+    Returns
+    -------
+        True if the frame is read into the stack
+    """
+    img = _forgiving_reader(filename, reader)
+    if img is None:
+        return False
+    if img.shape != _shared_stack.shape[1:]:
+        logger.error(f"{filename} has shape {img.shape}, expecting {_shared_stack.shape[1:]}, skipping.")
+        return False
+    if not _can_cast_frame(img.dtype, _shared_stack.dtype, _shared_casting):
+        logger.error(f"{filename} has type {img.dtype}, expecting {_shared_stack.dtype}, skipping.")
+        return False
+    np.copyto(_shared_stack[idx], img, casting="unsafe")
+    return True
+
+
+# use _func to avoid sphinx pulling it into docs
+def _load_tiff_pipelined(
+    filelist: List[str],
+    store: Callable[[int, Optional[np.ndarray]], None],
+    max_workers: int,
+    desc: str,
+    position: int = 0,
+) -> None:
+    """
+    Load compressed tiff images with separate read and decode stages.
+
+    Parameters
+    ----------
+    filelist:
+        List of tiff filenames/path.
+    store:
+        callable consuming the frame index and the decoded image, None for
+        files that cannot be read.
+    max_workers:
+        Number of decoding threads.
+    desc:
+        Description for progress bar.
+    position:
+        Line of the progress bar, see _load_images.
+
+    Notes
+    -----
+        A few reader threads pull the raw bytes from disk into a bounded queue
+        while the decoding threads decompress them, so that the disk latency
+        is hidden behind the decompression. The queue holds at most
+        2*max_workers files, which caps the memory used by the raw bytes.
+    """
+    nreaders = max(1, max_workers // 4)
+    buffers = queue.Queue(maxsize=2 * max_workers)
+    # NOTE: any error that is not forgiven stops both stages, the first one is
+    #       raised to the caller once all threads have returned.
+    stop = threading.Event()
+    errors = []
+
+    def _put(item: Optional[Tuple[int, Optional[bytes]]]) -> bool:
+        while not stop.is_set():
+            try:
+                buffers.put(item, timeout=_QUEUE_POLL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _read(indices: range) -> None:
+        try:
+            for idx in indices:
+                try:
+                    with open(filelist[idx], "rb") as f:
+                        item = (idx, f.read())
+                except OSError as e:
+                    logger.error(f"Cannot read {filelist[idx]}, skipping: {e}")
+                    item = (idx, None)
+                if not _put(item):
+                    return
+        except BaseException as e:
+            errors.append(e)
+            stop.set()
+
+    def _decode() -> None:
+        try:
+            while not stop.is_set():
+                try:
+                    item = buffers.get(timeout=_QUEUE_POLL)
+                except queue.Empty:
+                    continue
+                # NOTE: None is the end of stream marker
+                if item is None:
+                    return
+                idx, buf = item
+                img = None
+                if buf is not None:
+                    try:
+                        img = tifffile.imread(io.BytesIO(buf))
+                    except (OSError, ValueError, RuntimeError) as e:
+                        logger.error(f"Cannot decode {filelist[idx]}, skipping: {e}")
+                store(idx, img)
+                pbar.update(1)
+        except BaseException as e:
+            errors.append(e)
+            stop.set()
+
+    with ThreadPoolExecutor(max_workers=nreaders + max_workers) as executor, tqdm(
+        total=len(filelist), desc=desc, position=position
+    ) as pbar:
+        decoders = [executor.submit(_decode) for _ in range(max_workers)]
+        # each reader walks the files in order, interleaved with the other readers
+        readers = [executor.submit(_read, range(i, len(filelist), nreaders)) for i in range(nreaders)]
+        try:
+            wait(readers)
+            for _ in decoders:
+                _put(None)
+            wait(decoders)
+        except BaseException:
+            # e.g. KeyboardInterrupt while waiting, let the threads wind down
+            stop.set()
+            raise
+    if errors:
+        raise errors[0]
+
+
 # use _func to avoid sphinx pulling it into docs
 def _load_images(
     filelist: List[str],
     desc: str,
     max_workers: int,
+    use_processes: bool = False,
+    dtype: Optional[np.dtype] = None,
+    position: int = 0,
 ) -> np.ndarray:
     """
     Load image data via dxchange.
@@ -195,30 +571,251 @@ def _load_images(
     desc:
         Description for progress bar.
     max_workers:
-        Maximum number of processes allowed during loading.
+        Maximum number of workers allowed during loading, 0 means
+        use as many as possible.
+    use_processes:
+        Use a process pool instead of a thread pool, only useful for
+        readers that hold on to the GIL while decoding. The returned stack
+        is then backed by shared memory.
+    dtype:
+        Data type of the image stack, None keeps the data type from the reader,
+        i.e. the native uint16 of the detectors. Data that cannot be cast without
+        changing its kind, e.g. float to uint16, keeps the data type from the reader.
+    position:
+        Line of the progress bar, stacks loaded concurrently need one each so
+        that their bars do not overwrite each other.
 
     Returns
     -------
         Image array stack.
+
+    Notes
+    -----
+        dxchange readers spend most of their time inside libtiff/cfitsio
+        where the GIL is released, so a thread pool is used by default to
+        avoid pickling every decoded frame back to the parent process.
     """
-    # figure out the file type and select corresponding reader from dxchange
-    file_ext = Path(filelist[0]).suffix.lower()
-    if file_ext in (".tif", ".tiff"):
-        reader = dxchange.read_tiff
-    elif file_ext == ".fits":
-        reader = dxchange.read_fits
-    else:
+    # figure out the file type and select corresponding reader
+    file_ext = os.path.splitext(filelist[0])[1].lower()
+    reader = _READERS.get(file_ext)
+    if reader is None:
         logger.error(f"Unsupported file type: {file_ext}")
         raise ValueError("Unsupported file type.")
-    # read the data into numpy array via map_process
-    rst = process_map(
-        partial(_forgiving_reader, reader=reader),
-        filelist,
-        max_workers=max_workers,
-        desc=desc,
+    max_workers = max_workers if max_workers > 0 else _default_workers()
+    # a single multi-page tiff holds the whole stack, read it in one go
+    if len(filelist) == 1 and reader is _read_tiff and _is_tiff_stack(filelist[0]):
+        stack = tifffile.imread(filelist[0])
+        return stack.astype(_stack_dtype(stack.dtype, dtype, desc), copy=False)
+    # probe the first readable file for the shape and dtype of the stack
+    probe = None
+    for first, filename in enumerate(filelist):
+        probe = _forgiving_reader(filename, reader)
+        if probe is not None:
+            break
+    if probe is None:
+        logger.error(f"None of the {desc} files can be read.")
+        return np.array([])
+    # files from the same scan share the same layout, so the memory map decision
+    # made for the probe is reused instead of inspecting every file header
+    if reader is _read_tiff:
+        reader = _memmap_tiff if isinstance(probe, np.memmap) else dxchange.read_tiff
+    # preallocate the stack so that each frame is written in place
+    # NOTE: casting happens while copying into the stack, no temporary array is created
+    shape = (len(filelist),) + probe.shape
+    stack_dtype = _stack_dtype(probe.dtype, dtype, desc)
+    # NOTE: frames may only be narrowed when the caller asked for a data type
+    casting = "safe" if dtype is None else "same_kind"
+    # NOTE: worker processes write into the stack directly, so it lives in a shared
+    #       memory block whose mapping is released together with the stack.
+    shm = (
+        shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape)) * stack_dtype.itemsize))
+        if use_processes
+        else None
     )
+    try:
+        if shm is not None:
+            out = np.ndarray(shape, dtype=stack_dtype, buffer=shm.buf)
+            weakref.finalize(out, shm.close)
+        else:
+            out = np.empty(shape, dtype=stack_dtype)
+        mask = np.ones(len(filelist), dtype=bool)
+
+        def _store(idx: int, img: Optional[np.ndarray]) -> None:
+            if img is None:
+                mask[idx] = False
+            elif img.shape != probe.shape:
+                logger.error(f"{filelist[idx]} has shape {img.shape}, expecting {probe.shape}, skipping.")
+                mask[idx] = False
+            elif not _can_cast_frame(img.dtype, out.dtype, casting):
+                logger.error(f"{filelist[idx]} has type {img.dtype}, expecting {out.dtype}, skipping.")
+                mask[idx] = False
+            else:
+                # NOTE: memory mapped frames are read straight from the page cache here
+                np.copyto(out[idx], img, casting="unsafe")
+
+        # the probed frame goes straight into the stack, the files before it cannot be read
+        mask[:first] = False
+        _store(first, probe)
+        remaining = range(first + 1, len(filelist))
+
+        # read the data into the preallocated array
+        # NOTE: files are dispatched in batches to amortize the executor overhead,
+        #       with a few batches per worker to keep the tail short.
+        chunksize = max(1, len(remaining) // (max_workers * 4))
+        if use_processes:
+            # NOTE: workers write the frames into the shared stack and only send back
+            #       a flag, so no frame is pickled across the process boundary.
+            #       The loader may run in a worker thread, so the processes are not
+            #       forked from this multi-threaded process.
+            start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            with ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context(start_method),
+                initializer=_init_shared_stack,
+                initargs=(shm.name, out.shape, out.dtype, casting),
+            ) as executor:
+                rst = executor.map(
+                    partial(_read_into_shared, reader=reader),
+                    remaining,
+                    filelist[remaining.start :],
+                    chunksize=chunksize,
+                )
+                mask[remaining.start :] = list(tqdm(rst, total=len(remaining), desc=desc, position=position))
+        elif reader is dxchange.read_tiff:
+            # compressed tiff, decoding is overlapped with reading the next files
+            _load_tiff_pipelined(
+                filelist[remaining.start :],
+                lambda idx, img: _store(remaining.start + idx, img),
+                max_workers,
+                desc,
+                position,
+            )
+        else:
+            # NOTE: the process pool needs picklable module level functions, threads
+            #       can use a closure over the selected reader instead.
+            def _read_batch(start: int, stop: int) -> int:
+                for idx in range(start, stop):
+                    _store(idx, _forgiving_reader(filelist[idx], reader))
+                return stop - start
+
+            starts = range(remaining.start, len(filelist), chunksize)
+            stops = [min(start + chunksize, len(filelist)) for start in starts]
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                with tqdm(total=len(remaining), desc=desc, position=position) as pbar:
+                    for nread in executor.map(_read_batch, starts, stops):
+                        pbar.update(nread)
+    finally:
+        if shm is not None:
+            # the name is no longer needed, the mapping stays valid until the stack is released
+            shm.unlink()
     # return the results
-    return np.array([me for me in rst if me is not None])
+    if mask.all():
+        return out
+    # drop the corrupted frames by moving the valid ones forward in place, which
+    # avoids allocating a second stack through boolean indexing
+    valid = np.flatnonzero(mask)
+    for dst, src in enumerate(valid):
+        if dst != src:
+            out[dst] = out[src]
+    return out[: len(valid)]
+
+
+# use _func to avoid sphinx pulling it into docs
+def _always_true(filename: str) -> bool:
+    """
+    Match function for the accept-all selectors.
+    """
+    return True
+
+
+# use _func to avoid sphinx pulling it into docs
+def _glob_to_matcher(pattern: Optional[str]) -> Callable[[str], bool]:
+    """
+    Compile a Unix shell-style wild card into a match function.
+
+    Parameters
+    ----------
+    pattern:
+        fnmatch pattern, e.g. "*.tiff". None, "" and "*" select everything.
+
+    Returns
+    -------
+        match function consuming a filename string, _always_true for accept-all
+        selectors so that callers can skip matching altogether.
+
+    Notes
+    -----
+        The common patterns, i.e. plain names, "*.ext" and "prefix*", are matched
+        with plain string comparisons. Everything else, including character
+        ranges, falls back to the regex generated by fnmatch.translate.
+    """
+    if pattern in _ACCEPT_ALL:
+        return _always_true
+    if not _GLOB_SPECIAL.search(pattern):
+        return pattern.__eq__
+    if pattern[0] == "*" and not _GLOB_SPECIAL.search(pattern, 1):
+        return methodcaller("endswith", pattern[1:])
+    if pattern[-1] == "*" and not _GLOB_SPECIAL.search(pattern, 0, len(pattern) - 1):
+        return methodcaller("startswith", pattern[:-1])
+    return re.compile(translate(pattern)).match
+
+
+# use _func to avoid sphinx pulling it into docs
+def _select_files(
+    filelist: List[str],
+    pattern: Optional[str],
+) -> List[str]:
+    """
+    Down-select files with given fnmatch pattern.
+
+    Parameters
+    ----------
+    filelist:
+        List of filenames/paths.
+    pattern:
+        fnmatch pattern applied to the full path, None, "" and "*" skip the selection.
+
+    Returns
+    -------
+        List of selected filenames as str.
+    """
+    # NOTE: Path objects are accepted in the list, the matchers only work on str
+    filelist = map(os.fspath, filelist)
+    match = _glob_to_matcher(pattern)
+    if match is _always_true:
+        return list(filelist)
+    return list(filter(match, filelist))
+
+
+# use _func to avoid sphinx pulling it into docs
+def _scan_dir(
+    directory: str,
+    pattern: str,
+) -> List[str]:
+    """
+    List the files in given directory whose name matches the fnmatch pattern.
+
+    Parameters
+    ----------
+    directory:
+        Directory to scan.
+    pattern:
+        fnmatch pattern applied to the file name, patterns reaching into
+        sub-directories ("sub/*.tiff", "**/*.tiff") are handed to Path.glob.
+
+    Returns
+    -------
+        List of matching file paths as str.
+    """
+    if "/" in pattern or os.sep in pattern or "**" in pattern:
+        return list(map(str, Path(directory).glob(pattern)))
+    match = _glob_to_matcher(pattern)
+    # NOTE: scandir provides the entry type from the directory listing, so
+    #       no extra stat call is needed for regular files.
+    with os.scandir(directory) as it:
+        if match is _always_true:
+            return [entry.path for entry in it if entry.is_file()]
+        return [entry.path for entry in it if entry.is_file() and match(entry.name)]
 
 
 # use _func to avoid sphinx pulling it into docs
@@ -226,10 +823,12 @@ def _load_by_file_list(
     ct_files: List[str],
     ob_files: List[str],
     dc_files: Optional[List[str]] = [],
-    ct_fnmatch: Optional[str] = "*",
-    ob_fnmatch: Optional[str] = "*",
-    dc_fnmatch: Optional[str] = "*",
+    ct_fnmatch: Optional[str] = None,
+    ob_fnmatch: Optional[str] = None,
+    dc_fnmatch: Optional[str] = None,
     max_workers: int = 0,
+    dtype: Optional[np.dtype] = None,
+    use_processes: bool = False,
 ) -> Tuple[np.ndarray]:
     """
     Use provided list of files to load images into memory.
@@ -243,14 +842,19 @@ def _load_by_file_list(
     dc_files:
         List of dc files.
     ct_fnmatch:
-        fnmatch for selecting ct files from ct_dir.
+        fnmatch for selecting ct files from ct_dir, None skips the selection.
     ob_fnmatch:
-        fnmatch for selecting ob files from ob_dir.
+        fnmatch for selecting ob files from ob_dir, None skips the selection.
     dc_fnmatch:
-        fnmatch for selecting dc files from dc_dir.
+        fnmatch for selecting dc files from dc_dir, None skips the selection.
     max_workers:
         Maximum number of processes allowed during loading, 0 means
         use as many as possible.
+    dtype:
+        Data type of the loaded image stacks, None keeps the data type
+        from the reader.
+    use_processes:
+        Load with worker processes instead of threads.
 
     Returns
     -------
@@ -268,26 +872,34 @@ def _load_by_file_list(
 
     # explicit list is the most straight forward solution
     # -- radiograph
-    ct = _load_images(
-        filelist=[ctf for ctf in ct_files if fnmatchcase(ctf, ct_fnmatch)],
-        desc="ct",
-        max_workers=max_workers,
-    )
+    jobs = [("ct", _select_files(ct_files, ct_fnmatch))]
     # -- open beam
-    ob = _load_images(
-        filelist=[obf for obf in ob_files if fnmatchcase(obf, ob_fnmatch)],
-        desc="ob",
-        max_workers=max_workers,
-    )
+    jobs.append(("ob", _select_files(ob_files, ob_fnmatch)))
     # -- dark current
-    if dc_files == []:
-        dc = None
-    else:
-        dc = _load_images(
-            filelist=[dcf for dcf in dc_files if fnmatchcase(dcf, dc_fnmatch)],
-            desc="dc",
-            max_workers=max_workers,
-        )
+    if dc_files != []:
+        jobs.append(("dc", _select_files(dc_files, dc_fnmatch)))
+
+    # load ct, ob and dc concurrently, splitting the workers proportional to
+    # the number of files in each stack
+    # NOTE: each stack has its own progress bar line
+    max_workers = _default_workers() if max_workers == 0 else max_workers
+    total = max(1, sum(len(filelist) for _, filelist in jobs))
+    with ThreadPoolExecutor(max_workers=len(jobs)) as executor:
+        futures = {
+            kind: executor.submit(
+                _load_images,
+                filelist=filelist,
+                desc=kind,
+                max_workers=max(1, max_workers * len(filelist) // total),
+                dtype=dtype,
+                use_processes=use_processes,
+                position=position,
+            )
+            for position, (kind, filelist) in enumerate(jobs)
+        }
+    ct = futures["ct"].result()
+    ob = futures["ob"].result()
+    dc = futures["dc"].result() if "dc" in futures else None
     #
     return ct, ob, dc
 
@@ -350,13 +962,13 @@ def _get_filelist_by_dir(
         dc_dir = Path(dc_dir)
 
     # gather the ct_files
-    ct_files = ct_dir.glob(ct_fnmatch)
+    ct_files = _scan_dir(ct_dir, ct_fnmatch)
 
     # gather the ob_files
     if ob_fnmatch is None:
         raise NotImplementedError("ob_fnmatch is None is not implemented yet.")
     else:
-        ob_files = ob_dir.glob(ob_fnmatch)
+        ob_files = _scan_dir(ob_dir, ob_fnmatch)
 
     # gather the dc_files
     if dc_dir is None:
@@ -365,9 +977,9 @@ def _get_filelist_by_dir(
         if dc_fnmatch is None:
             raise NotImplementedError("dc_fnmatch is None is not implemented yet.")
         else:
-            dc_files = dc_dir.glob(dc_fnmatch)
+            dc_files = _scan_dir(dc_dir, dc_fnmatch)
 
-    return list(map(str, ct_files)), list(map(str, ob_files)), list(map(str, dc_files))
+    return ct_files, ob_files, dc_files
 
 
 def _extract_rotation_angles(
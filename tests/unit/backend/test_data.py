@@ -8,12 +8,18 @@ import pytest
 import astropy.io.fits as fits
 import tifffile
 import numpy as np
+import threading
 from functools import partial
 from unittest import mock
 from pathlib import Path
 from imars3d.backend.data import load_data
+from imars3d.backend.data import _default_workers
 from imars3d.backend.data import _forgiving_reader
+from imars3d.backend.data import _read_tiff
+from imars3d.backend.data import _load_tiff_pipelined
 from imars3d.backend.data import _load_images
+from imars3d.backend.data import _glob_to_matcher
+from imars3d.backend.data import _select_files
 from imars3d.backend.data import _load_by_file_list
 from imars3d.backend.data import _get_filelist_by_dir
 from imars3d.backend.data import _extract_rotation_angles
@@ -64,24 +70,121 @@ def test_load_data(_load_by_file_list, _get_filelist_by_dir, _extract_rotation_a
     # error_1: out of bounds value
     with pytest.raises(ValueError):
         load_data(ct_files=[], ob_files=[], dc_files=[], max_workers=-1)
-    # error_2: mix usage of function signature 1 and 2
+    # error_2: unknown argument
+    with pytest.raises(ValueError):
+        load_data(ct_files=[], ob_files=[], dc_files=[], ct_regex="*")
+    # error_3: mix usage of function signature 1 and 2
     with pytest.raises(ValueError):
         load_data(ct_files=[], ob_files=[], dc_files=[], ct_dir="/tmp", ob_dir="/tmp")
     # case_1: load data from file list
-    rst = load_data(ct_files=["1", "2"], ob_files=["3", "4"], dc_files=["5", "6"])
+    rst = load_data(ct_files=["1", "2"], ob_files=["3", "4"], dc_files=["5", "6"], max_workers=3)
     assert rst == (1, 2, 3, 4)
-    # case_2: load data from given directory
-    rst = load_data(ct_dir="/tmp", ob_dir="/tmp", dc_dir="/tmp")
+    _load_by_file_list.assert_called_with(
+        ct_files=["1", "2"],
+        ob_files=["3", "4"],
+        dc_files=["5", "6"],
+        ct_fnmatch="*",
+        ob_fnmatch="*",
+        dc_fnmatch="*",
+        max_workers=3,
+        dtype=None,
+        use_processes=False,
+    )
+    # case_1.1: requested data type is passed through
+    load_data(ct_files=["1", "2"], ob_files=["3", "4"], dtype=np.uint16)
+    assert _load_by_file_list.call_args.kwargs["dtype"] == np.uint16
+    # case_2: load data from given directory, the selectors are applied by the scan only
+    rst = load_data(ct_dir="/tmp", ob_dir="/tmp", dc_dir="/tmp", ct_fnmatch="*.tiff", max_workers=3)
     assert rst == (1, 2, 3, 4)
+    _load_by_file_list.assert_called_with(
+        ct_files="1",
+        ob_files="2",
+        dc_files="3",
+        ct_fnmatch=None,
+        ob_fnmatch=None,
+        dc_fnmatch=None,
+        max_workers=3,
+        dtype=None,
+        use_processes=False,
+    )
+
+
+def test_default_workers():
+    # case_1: respect the affinity mask
+    with mock.patch("os.sched_getaffinity", create=True, return_value={0, 1, 2, 3}):
+        assert _default_workers() == 2
+    # case_2: always keep at least one worker
+    with mock.patch("os.sched_getaffinity", create=True, return_value={0}):
+        assert _default_workers() == 1
+    # case_3: fall back to cpu_count where affinity is not available
+    with mock.patch("os.sched_getaffinity", create=True, side_effect=AttributeError), \
+         mock.patch("multiprocessing.cpu_count", return_value=8):
+        assert _default_workers() == 6
 
 
 def test_forgiving_reader():
     # correct usage
     goodReader = lambda x: x
     assert _forgiving_reader(filename="test", reader=goodReader) == "test"
-    # incorrect usage, but bypass the exception
-    badReader = lambda x: x/0
+    # corrupted file, bypass the exception
+    def badReader(x):
+        raise OSError(f"{x} is corrupted")
     assert _forgiving_reader(filename="test", reader=badReader) is None
+    # incorrect usage, the exception is not swallowed
+    wrongReader = lambda x: x/0
+    with pytest.raises(TypeError):
+        _forgiving_reader(filename="test", reader=wrongReader)
+
+
+def test_read_tiff(test_data):
+    # case_1: uncompressed tiff is memory mapped
+    rst = _read_tiff("test.tiff")
+    assert isinstance(rst, np.memmap)
+    np.testing.assert_array_equal(rst, np.ones((3, 3)))
+    # case_2: compressed tiff is decoded
+    tifffile.imwrite("test_compressed.tiff", np.ones((3, 3)), compression="zlib")
+    rst = _read_tiff("test_compressed.tiff")
+    assert not isinstance(rst, np.memmap)
+    np.testing.assert_array_equal(rst, np.ones((3, 3)))
+    os.remove("test_compressed.tiff")
+
+
+def test_load_tiff_pipelined(test_data):
+    filelist = ["test.tiff"] * 20
+    out = np.zeros((20, 3, 3))
+
+    def store(idx, img):
+        out[idx] = img
+
+    def run(store):
+        # NOTE: a deadlock shows up as a test failure instead of hanging the test
+        errors = []
+
+        def target():
+            try:
+                _load_tiff_pipelined(filelist, store, 2, "test")
+            except BaseException as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=target, daemon=True)
+        thread.start()
+        thread.join(timeout=30)
+        assert not thread.is_alive(), "pipeline is deadlocked"
+        if errors:
+            raise errors[0]
+
+    # case_1: all frames are stored
+    run(store)
+    np.testing.assert_array_equal(out, np.ones((20, 3, 3)))
+    # error_1: decoder error that is not forgiven stops the pipeline
+    with mock.patch("imars3d.backend.data.tifffile.imread", side_effect=KeyError("bad decoder")):
+        with pytest.raises(KeyError):
+            run(store)
+    # error_2: failing to store the frame stops the pipeline
+    def bad_store(idx, img):
+        raise MemoryError("out of memory")
+    with pytest.raises(MemoryError):
+        run(bad_store)
 
 
 def test_load_images(test_data):
@@ -94,12 +197,91 @@ def test_load_images(test_data):
     tiff_filelist = ["test.tiff", "test.tiff"]
     rst = func(filelist=tiff_filelist)
     assert rst.shape == (2, 3, 3)
+    # case1.1: uint16 tiff stays uint16
+    tifffile.imwrite("test_uint16.tiff", np.full((3, 3), 7, dtype=np.uint16))
+    rst = func(filelist=["test_uint16.tiff", "test_uint16.tiff"])
+    assert rst.dtype == np.uint16
+    np.testing.assert_array_equal(rst, np.full((2, 3, 3), 7))
+    os.remove("test_uint16.tiff")
+    # case1.2: float tiff is never truncated to uint16
+    data = np.array([[0.7, -1.5, 2.0]] * 3, dtype=np.float32)
+    tifffile.imwrite("test_float32.tiff", data)
+    rst = func(filelist=["test_float32.tiff", "test_float32.tiff"])
+    assert rst.dtype == np.float32
+    np.testing.assert_array_equal(rst, np.stack([data, data]))
+    os.remove("test_float32.tiff")
+    # case1.2.1: wider unsigned tiff is never wrapped around, narrower one is never upcast
+    for dtype, value in ((np.uint32, 70000), (np.uint8, 200)):
+        tifffile.imwrite("test_uint.tiff", np.full((3, 3), value, dtype=dtype))
+        rst = func(filelist=["test_uint.tiff", "test_uint.tiff"])
+        assert rst.dtype == dtype
+        np.testing.assert_array_equal(rst, np.full((2, 3, 3), value))
+    os.remove("test_uint.tiff")
+    # case1.3: float tiff, down cast when requested
+    rst = func(filelist=tiff_filelist, dtype=np.float32)
+    assert rst.dtype == np.float32
+    # case1.4: float tiff is kept when requested type is of another kind
+    rst = func(filelist=tiff_filelist, dtype=np.uint16)
+    assert rst.dtype == np.float64
+    # case1.5: multi-page tiff is read as a stack in one go
+    tifffile.imwrite("test_stack.tiff", np.ones((4, 3, 3)), photometric="minisblack")
+    rst = func(filelist=["test_stack.tiff"])
+    assert rst.shape == (4, 3, 3)
+    assert rst.dtype == np.float64
+    os.remove("test_stack.tiff")
+    # case1.6: tiff, loaded by worker processes through shared memory
+    rst = func(filelist=tiff_filelist, use_processes=True)
+    assert rst.shape == (2, 3, 3)
+    np.testing.assert_array_equal(rst, np.ones((2, 3, 3)))
+    # case1.7: compressed tiff, read and decoded in separate stages
+    tifffile.imwrite("test_compressed.tiff", np.ones((3, 3)), compression="zlib")
+    rst = func(filelist=["test_compressed.tiff"] * 5)
+    assert rst.shape == (5, 3, 3)
+    np.testing.assert_array_equal(rst, np.ones((5, 3, 3)))
+    os.remove("test_compressed.tiff")
+    # case1.8: corrupted files are dropped from the stack
+    with open("test_corrupted.tiff", "w") as f:
+        f.write("not a tiff")
+    rst = func(filelist=["test.tiff", "test_corrupted.tiff", "test.tiff"])
+    assert rst.shape == (2, 3, 3)
+    np.testing.assert_array_equal(rst, np.ones((2, 3, 3)))
+    # case1.9: corrupted files ahead of the first readable one
+    rst = func(filelist=["test_corrupted.tiff", "test.tiff", "test_corrupted.tiff", "test.tiff"])
+    assert rst.shape == (2, 3, 3)
+    np.testing.assert_array_equal(rst, np.ones((2, 3, 3)))
+    os.remove("test_corrupted.tiff")
     # case2: fits
     fits_filelist = ["test.fits", "test.fits"]
     rst = func(filelist=fits_filelist)
     assert rst.shape == (2, 3, 3)
 
 
+def test_glob_to_matcher():
+    filelist = ["a_0001.tiff", "a_0002.tif", "b_0001.fits", "a_0001.tiff.bak"]
+    cases = {
+        "*": filelist,
+        "a_0001.tiff": ["a_0001.tiff"],
+        "*.tiff": ["a_0001.tiff"],
+        "a_*": ["a_0001.tiff", "a_0002.tif", "a_0001.tiff.bak"],
+        "*_0001.*": ["a_0001.tiff", "b_0001.fits", "a_0001.tiff.bak"],
+        "a_000[2-9].ti?": ["a_0002.tif"],
+    }
+    for pattern, ref in cases.items():
+        match = _glob_to_matcher(pattern)
+        assert [f for f in filelist if match(f)] == ref
+
+
+def test_select_files():
+    filelist = ["/tmp/a_0001.tiff", Path("/tmp/a_0002.tiff"), "/tmp/b_0001.fits"]
+    ref = ["/tmp/a_0001.tiff", "/tmp/a_0002.tiff", "/tmp/b_0001.fits"]
+    # case_1: accept-all selectors keep everything
+    for pattern in (None, "", "*"):
+        assert _select_files(filelist, pattern) == ref
+    # case_2: down-select with fnmatch pattern
+    assert _select_files(filelist, "*.tiff") == ref[:2]
+    assert _select_files(filelist, "*_0001.*") == [ref[0], ref[2]]
+
+
 @mock.patch("imars3d.backend.data._load_images", return_value="a")
 def test_load_by_file_list(_load_images):
     # error_1: ct empty
@@ -111,12 +293,15 @@ def test_load_by_file_list(_load_images):
     # case_1: load all three
     rst = _load_by_file_list(ct_files=["a.tiff"], ob_files=["a.tiff"], dc_files=["a.tiff"])
     assert rst == ("a", "a", "a")
+    # each stack has its own progress bar line
+    positions = {call.kwargs["desc"]: call.kwargs["position"] for call in _load_images.call_args_list}
+    assert positions == {"ct": 0, "ob": 1, "dc": 2}
     # case_2: load only ct and ob
     rst = _load_by_file_list(ct_files=["a.tiff"], ob_files=["a.tiff"])
     assert rst == ("a", "a", None)
 
 
-def test_get_filelist_by_dir(test_data):
+def test_get_filelist_by_dir(test_data, tmp_path):
     # error_1: ct_dir does not exists
     with pytest.raises(ValueError):
         _get_filelist_by_dir(ct_dir="dummy", ob_dir="/tmp", dc_dir="/tmp")
@@ -145,6 +330,15 @@ def test_get_filelist_by_dir(test_data):
         dc_fnmatch=fnpattern,
     )
     assert rst == (ref, ref, [])
+    # case_3: patterns reaching into sub-directories
+    ct_dir = tmp_path / "ct"
+    (ct_dir / "sub").mkdir(parents=True)
+    tifffile.imwrite(ct_dir / "b.tiff", np.ones((3, 3)))
+    tifffile.imwrite(ct_dir / "sub" / "a.tiff", np.ones((3, 3)))
+    rst = _get_filelist_by_dir(ct_dir=str(ct_dir), ob_dir=str(ct_dir), ct_fnmatch="sub/*.tiff")
+    assert rst[0] == [str(ct_dir / "sub" / "a.tiff")]
+    rst = _get_filelist_by_dir(ct_dir=str(ct_dir), ob_dir=str(ct_dir), ct_fnmatch="**/*.tiff")
+    assert sorted(rst[0]) == [str(ct_dir / "b.tiff"), str(ct_dir / "sub" / "a.tiff")]
     # case_2: load ct, and detect ob and df from metadata
     # TODO: once the FileMetaData class is ready, we can start
     # case_3: load ct, and detect ob from metadata